@@ -1,9 +1,11 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
 import io
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from importlib.util import find_spec
+
+# Only check that calamine is installed; pandas imports it on the first upload
+read_engine = "calamine" if find_spec("python_calamine") else "openpyxl"
 
 # ----------------------------
 # 🗕 Public Holidays
@@ -12,104 +14,145 @@ public_holidays = pd.to_datetime([
     "2025-01-26", "2025-08-15", "2025-10-02", "2025-12-25"
 ])
 
+# Saturdays and Sundays are non-working; public holidays are excluded on top
+working_calendar = np.busdaycalendar(
+    weekmask="1111100",
+    holidays=public_holidays.values.astype('datetime64[D]')
+)
+
+template_columns = [
+    "Sl.No", "CandidateCode", "Candidate Name",
+    "BWR_Date of Submission", "BWR_TAT Due On", "BWR_Reinitiated", "BWR_Date of Report Received",
+    "BGV_Received On", "BGV_TAT Due On", "BGV_Reinitiated", "BGV_Final Dispatch"
+]
+
+month_names = np.array(["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                        "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"])
+
 # ----------------------------
 # 🧠 Helper Functions
 # ----------------------------
-def is_working_day(date):
-    if date.weekday() >= 5:  # Saturday (5) or Sunday (6)
-        return False
-    if date in public_holidays:
-        return False
-    return True
-
-def add_working_days(start_date, n):
-    date = start_date
-    count = 0
-    while count < n:
-        date += timedelta(days=1)
-        if is_working_day(date):
-            count += 1
-    return date
-
-def calculate_due(row):
-    if pd.notnull(row['BGV_Reinitiated']):
-        return add_working_days(row['BGV_Reinitiated'], 15)
-    elif pd.notnull(row['BGV_Received On']):
-        return add_working_days(row['BGV_Received On'], 15)
-    return pd.NaT
-
-def calculate_remarks(row):
-    dispatch = row['BGV_Final Dispatch']
-    due = row['Final TAT Due Date for Report']
-    if pd.isnull(dispatch) or pd.isnull(due):
-        return "Pending", ""
-    diff = (dispatch - due).days
-    if diff <= 0:
-        return "Within TAT", ""
-    return "Exceeded", f"{diff} days Deduction"
+def is_date_column(col):
+    return "Date" in col or "On" in col or "Reinitiated" in col or "Dispatch" in col
+
+def parse_dates(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    # Template dates are DD-MMM-YYYY; only the leftovers go through the general parser
+    parsed = pd.to_datetime(series, format='%d-%b-%Y', errors='coerce')
+    unparsed = parsed.isna() & series.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(series[unparsed], errors='coerce')
+    return parsed
+
+def format_dates(series):
+    # Builds DD-MMM-YYYY from the day/month/year parts of the datetime64 array
+    days = series.values.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    day = np.char.zfill(((days - months).astype(int) + 1).astype(str), 2)
+    month = month_names[months.astype(int) % 12]
+    year = (days.astype('datetime64[Y]').astype(int) + 1970).astype(str)
+    text = np.char.add(np.char.add(np.char.add(day, "-"), np.char.add(month, "-")), year).astype(object)
+    text[np.isnat(days)] = np.nan
+    return pd.Series(text, index=series.index)
+
+def add_bdays(dates, n):
+    # Rolling backward first means a start on a holiday or weekend counts
+    # from the next working day, same as stepping forward day by day
+    days = dates.values.astype('datetime64[D]')
+    due = np.busday_offset(days, n, roll='backward', busdaycal=working_calendar)
+    return pd.Series(due, index=dates.index).astype('datetime64[ns]')
+
+def calculate_due(df):
+    start = df['BGV_Reinitiated'].fillna(df['BGV_Received On'])
+    return add_bdays(start, 15)
+
+def calculate_remarks(df):
+    diff = (df['BGV_Final Dispatch'] - df['Final TAT Due Date for Report']).dt.days
+    remarks = np.select([diff.isna(), diff <= 0], ["Pending", "Within TAT"], "Exceeded")
+    due_days = np.where(diff > 0, diff.fillna(0).astype(int).astype(str) + " days Deduction", "")
+    return remarks, due_days
 
 def process_report(df):
-    for col in df.columns:
-        if "Date" in col or "On" in col or "Reinitiated" in col or "Dispatch" in col:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+    date_cols = [col for col in df.columns if is_date_column(col)]
+    df[date_cols] = df[date_cols].apply(parse_dates)
 
-    df['Final TAT Due Date for Report'] = df.apply(calculate_due, axis=1)
-    df[['Remarks', 'Due Days']] = df.apply(lambda row: pd.Series(calculate_remarks(row)), axis=1)
+    df['Final TAT Due Date for Report'] = calculate_due(df)
+    df['Remarks'], df['Due Days'] = calculate_remarks(df)
 
     for col in df.columns:
         if pd.api.types.is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.strftime('%d-%b-%Y')
+            df[col] = format_dates(df[col])
 
     return df
 
 def style_excel(df):
+    from xlsxwriter.utility import xl_col_to_name
+
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl', date_format='DD-MMM-YYYY') as writer:
+    with pd.ExcelWriter(output, engine='xlsxwriter', date_format='dd-mmm-yyyy') as writer:
         df.to_excel(writer, sheet_name='BGV_Report', index=False)
+        workbook = writer.book
         sheet = writer.sheets['BGV_Report']
 
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        alt_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-        green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        yellow_fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-        center = Alignment(horizontal='center', vertical='center')
-
-        for col_num, col in enumerate(df.columns, 1):
-            cell = sheet.cell(row=1, column=col_num)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center
-
-        remarks_col = df.columns.get_loc("Remarks") + 1
-        due_col = df.columns.get_loc("Due Days") + 1
-
-        for row in range(2, sheet.max_row + 1):
-            remark = sheet.cell(row=row, column=remarks_col).value
-            color = None
-            if remark == "Within TAT":
-                color = green_fill
-            elif remark == "Exceeded":
-                color = red_fill
-            elif remark == "Pending":
-                color = yellow_fill
-
-            for col in range(1, sheet.max_column + 1):
-                cell = sheet.cell(row=row, column=col)
-                if row % 2 == 0 and not color:
-                    cell.fill = alt_fill
-                if col in [remarks_col, due_col] and color:
-                    cell.fill = color
-                cell.alignment = center
-
-        for col_num, col in enumerate(df.columns, 1):
-            max_len = max(df[col].astype(str).map(len).max(), len(col))
-            sheet.column_dimensions[get_column_letter(col_num)].width = max_len + 2
+        center = {'align': 'center', 'valign': 'vcenter'}
+        header_fmt = workbook.add_format({'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#4F81BD', **center})
+        center_fmt = workbook.add_format(center)
+        alt_fmt = workbook.add_format({'bg_color': '#F2F2F2'})
+        remark_fmts = {
+            "Within TAT": workbook.add_format({'bg_color': '#C6EFCE'}),
+            "Exceeded": workbook.add_format({'bg_color': '#FFC7CE'}),
+            "Pending": workbook.add_format({'bg_color': '#FFEB9C'}),
+        }
+
+        for col_num, col in enumerate(df.columns):
+            sheet.write(0, col_num, col, header_fmt)
+            if is_date_column(col):
+                # Dates are already formatted as DD-MMM-YYYY
+                max_len = max(11, len(col))
+            else:
+                max_len = max(np.char.str_len(df[col].to_numpy(dtype=str)).max(initial=0), len(col))
+            sheet.set_column(col_num, col_num, max_len + 2, center_fmt)
+
+        # Excel evaluates the coloring itself; formulas are relative to the
+        # first data row and pin the Remarks column
+        last_row = len(df)
+        last_col = len(df.columns) - 1
+        remarks_ref = f"${xl_col_to_name(df.columns.get_loc('Remarks'))}2"
+        for col in ("Remarks", "Due Days"):
+            col_num = df.columns.get_loc(col)
+            for remark, fmt in remark_fmts.items():
+                sheet.conditional_format(1, col_num, last_row, col_num, {
+                    'type': 'formula',
+                    'criteria': f'={remarks_ref}="{remark}"',
+                    'format': fmt,
+                })
+        unmarked = ",".join(f'{remarks_ref}<>"{remark}"' for remark in remark_fmts)
+        sheet.conditional_format(1, 0, last_row, last_col, {
+            'type': 'formula',
+            'criteria': f'=AND(MOD(ROW(),2)=0,{unmarked})',
+            'format': alt_fmt,
+        })
 
     output.seek(0)
     return output
 
+@st.cache_resource
+def get_template_bytes():
+    buffer = io.BytesIO()
+    pd.DataFrame(columns=template_columns).to_excel(buffer, index=False, engine='xlsxwriter')
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False)
+def read_upload(file_bytes):
+    return pd.read_excel(io.BytesIO(file_bytes), engine=read_engine)
+
+@st.cache_data(show_spinner=False)
+def build_report(file_bytes):
+    # Keyed on the raw upload so widget reruns reuse the finished report
+    result_df = process_report(read_upload(file_bytes))
+    return result_df, style_excel(result_df).getvalue()
+
 # ----------------------------
 # 🌐 Streamlit UI
 # ----------------------------
@@ -162,17 +205,9 @@ with st.sidebar:
 
 # 📅 Template Download
 with st.expander("⬇️ Download Excel Template", expanded=True):
-    template_columns = [
-        "Sl.No", "CandidateCode", "Candidate Name",
-        "BWR_Date of Submission", "BWR_TAT Due On", "BWR_Reinitiated", "BWR_Date of Report Received",
-        "BGV_Received On", "BGV_TAT Due On", "BGV_Reinitiated", "BGV_Final Dispatch"
-    ]
-    template_df = pd.DataFrame(columns=template_columns)
-    buffer = io.BytesIO()
-    template_df.to_excel(buffer, index=False)
     st.download_button(
         "📄 Download Template",
-        buffer.getvalue(),
+        get_template_bytes(),
         file_name="BGV_Template.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
@@ -183,7 +218,8 @@ uploaded_file = st.file_uploader("Upload the filled Excel file", type="xlsx")
 
 if uploaded_file:
     try:
-        df = pd.read_excel(uploaded_file)
+        file_bytes = uploaded_file.getvalue()
+        df = read_upload(file_bytes)
         if df.empty:
             st.warning("⚠️ Uploaded file is empty.")
             st.stop()
@@ -192,13 +228,12 @@ if uploaded_file:
         if missing_cols:
             st.error(f"❌ Missing columns: {', '.join(missing_cols)}")
         else:
-            result_df = process_report(df)
+            result_df, excel_data = build_report(file_bytes)
             st.success("✅ Report generated successfully!")
 
             st.subheader("🔍 Preview Report")
-            st.dataframe(result_df, use_container_width=True)
+            st.dataframe(result_df, use_container_width=True, height=450)
 
-            excel_data = style_excel(result_df)
             st.download_button(
                 "📁 Download Final Report",
                 excel_data,